@@ -37,6 +37,7 @@ def shopify_source(
     data is limited to items updated in that time range.
     The range is "half-open", meaning elements equal and newer than `start_time` and elements older than `end_time` are included.
     All resources opt-in to use Airflow scheduler if run as Airflow task
+    Resources are parallelized, so when several are selected they are extracted concurrently.
 
     Args:
         private_app_password: The app password to the app on your shop.
@@ -64,7 +65,7 @@ def shopify_source(
     created_at_min_obj = ensure_pendulum_datetime(created_at_min)
 
     # define resources
-    @dlt.resource(primary_key="id", write_disposition="merge")
+    @dlt.resource(primary_key="id", write_disposition="merge", parallelized=True)
     def products(
         updated_at: dlt.sources.incremental[
             pendulum.DateTime
@@ -96,7 +97,7 @@ def shopify_source(
             params["updated_at_max"] = updated_at.end_value.isoformat()
         yield from client.get_pages("products", params)
 
-    @dlt.resource(primary_key="id", write_disposition="merge")
+    @dlt.resource(primary_key="id", write_disposition="merge", parallelized=True)
     def orders(
         updated_at: dlt.sources.incremental[
             pendulum.DateTime
@@ -130,7 +131,7 @@ def shopify_source(
             params["updated_at_max"] = updated_at.end_value.isoformat()
         yield from client.get_pages("orders", params)
 
-    @dlt.resource(primary_key="id", write_disposition="merge")
+    @dlt.resource(primary_key="id", write_disposition="merge", parallelized=True)
     def customers(
         updated_at: dlt.sources.incremental[
             pendulum.DateTime
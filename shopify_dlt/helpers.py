@@ -1,13 +1,19 @@
 """Shopify source helpers"""
+import time
 from urllib.parse import urljoin
 
 from dlt.common.time import ensure_pendulum_datetime
 from dlt.sources.helpers import requests
 from dlt.common.typing import TDataItem, TDataItems, Dict, DictStrAny
-from dlt.common import jsonpath
+from dlt.common import json, jsonpath
 from typing import Any, Iterable, Optional, Literal
 
-from .settings import DEFAULT_API_VERSION, DEFAULT_PARTNER_API_VERSION
+from .settings import (
+    DEFAULT_API_VERSION,
+    DEFAULT_PARTNER_API_VERSION,
+    REST_CALL_LIMIT_HEADROOM,
+    REST_LEAK_RATE,
+)
 from .exceptions import ShopifyPartnerApiError
 
 TOrderStatus = Literal["open", "closed", "cancelled", "any"]
@@ -53,13 +59,28 @@ class ShopifyApi:
         while url:
             response = requests.get(url, params=params, headers=headers)
             response.raise_for_status()
-            json = response.json()
+            self._wait_for_call_limit(response)
+            # dlt's json module uses orjson when available, which parses the raw bytes directly
+            data = json.loadb(response.content)
             # Get item list from the page
-            yield [self._convert_datetime_fields(item) for item in json[resource]]
+            yield [self._convert_datetime_fields(item) for item in data[resource]]
             url = response.links.get("next", {}).get("url")
             # Query params are included in subsequent page URLs
             params = None
 
+    def _wait_for_call_limit(self, response: requests.Response) -> None:
+        """Pause when the REST call bucket is nearly full, rather than running into 429s
+
+        Shopify reports the bucket in the X-Shopify-Shop-Api-Call-Limit header (e.g. "39/40"),
+        which is shared by every loader hitting the shop at the same time.
+
+        Args:
+            response: The response whose call limit header to check
+        """
+        used, _, limit = response.headers.get("X-Shopify-Shop-Api-Call-Limit", "").partition("/")
+        if used.isdigit() and limit.isdigit() and int(limit) - int(used) <= REST_CALL_LIMIT_HEADROOM:
+            time.sleep(1 / REST_LEAK_RATE)
+
     def _convert_datetime_fields(self, item: Dict[str, Any]) -> Dict[str, Any]:
         """Convert timestamp fields in the item to pendulum datetime objects
 
@@ -119,7 +140,7 @@ class ShopifyPartnerApi:
             json={"query": query, "variables": variables},
             headers=headers,
         )
-        data = response.json()
+        data = json.loadb(response.content)
         if data.get("errors"):
             raise ShopifyPartnerApiError(response.text)
         return data  # type: ignore[no-any-return]
@@ -135,7 +156,6 @@ class ShopifyPartnerApi:
         variables = dict(variables or {})
         while True:
             data = self.run_graphql_query(query, variables)
-            print(data)
             data_items = jsonpath.find_values(data_items_path, data)
             if not data_items:
                 break
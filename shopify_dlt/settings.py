@@ -2,4 +2,9 @@ FIRST_DAY_OF_MILLENNIUM = "2000-01-01"
 DEFAULT_API_VERSION = "2023-10"
 DEFAULT_ITEMS_PER_PAGE = 250
 
+# REST leaky bucket: requests leak out at this rate per second, and we pause once only this
+# many calls are left in the bucket (see the X-Shopify-Shop-Api-Call-Limit header)
+REST_LEAK_RATE = 2
+REST_CALL_LIMIT_HEADROOM = 2
+
 DEFAULT_PARTNER_API_VERSION = "2024-01"
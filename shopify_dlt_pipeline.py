@@ -1,9 +1,17 @@
 # shopify_pipeline.py
+import atexit
 import logging
+import logging.handlers
+import queue
 import dlt
 from dlt.common import pendulum
-from typing import List, Tuple
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 import time
+from dataclasses import dataclass
+from datetime import timedelta
+from functools import lru_cache
+from math import ceil
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from shopify_dlt import shopify_source, TAnyDateTime, shopify_partner_query
 
 from shopify_extras import (
@@ -19,43 +27,167 @@ from shopify_extras import (
 )
 
 # Logging config, DLT by default doesn't provide much in the way of logging.
-
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-    force=True,
+# Loaders log from worker threads. Records go through a queue and a single listener thread
+# writes them out, so workers never wait on the stream handler's lock.
+
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(
+    logging.Formatter(
+        "%(asctime)s | %(levelname)s | %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
 )
+_log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_queue_handler = logging.handlers.QueueHandler(_log_queue)
+_queue_handler.setFormatter(logging.Formatter("%(message)s"))
+logging.basicConfig(level=logging.INFO, handlers=[_queue_handler], force=True)
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_handler)
+_log_listener.start()
+atexit.register(_log_listener.stop)
 logger = logging.getLogger(__name__)
 
 
+# Core Shopify resources loaded incrementally by both the regular run and the backfill.
+
+CORE_RESOURCES: Tuple[str, ...] = ("products", "orders", "customers")
+
+
+# Postgres destination. csv load files are loaded with COPY ... FROM STDIN instead of
+# row-by-row INSERT VALUES statements, which is much faster for large tables.
+# Note: COPY reads empty strings as NULL, so text fields Shopify sends as "" (notes, tags,
+# address2, ...) arrive as NULL in Postgres. Queries should treat NULL and '' alike.
+
+POSTGRES_DESTINATION = dlt.destinations.postgres(preferred_loader_file_format="csv")
+
+
+# Pipelines are built once per process. Creating one scans the pipelines dir and loads its
+# state, so repeated calls (and the per-loader / per-chunk pipelines) reuse the same object.
+@lru_cache(maxsize=None)
+def get_pipeline(
+    pipeline_name: str = "shopify_local", dataset_name: str = "shopify_dlt_data"
+) -> dlt.Pipeline:
+    return dlt.pipeline(
+        pipeline_name=pipeline_name,
+        destination=POSTGRES_DESTINATION,
+        dataset_name=dataset_name,
+    )
+
+
 # Helper to run a loader function and log timing
 
-def run_loader(name, fn, pipeline):
-    logger.info(f"➡️ Starting loader: {name}")
-    start = time.time()
+@dataclass
+class LoaderResult:
+    name: str
+    ok: bool
+    elapsed: float
+    result: Any = None
+    exc: Optional[BaseException] = None
+
+
+class LoaderFailures(Exception):
+    """Raised once all loaders have run, if any of them failed."""
+
+    def __init__(self, failures: List[LoaderResult]) -> None:
+        self.failures = failures
+        super().__init__(", ".join(f"{r.name}: {r.exc!r}" for r in failures))
+
+
+def run_loader(name, fn, pipeline) -> LoaderResult:
+    logger.info("➡️ Starting loader: %s", name)
+    start = time.perf_counter()
     try:
         result = fn(pipeline)
-        elapsed = round(time.time() - start, 2)
-        logger.info(f"✅ Loader {name} complete in {elapsed}s")
-        return result
+        elapsed = round(time.perf_counter() - start, 2)
+        logger.info("✅ Loader %s complete in %ss", name, elapsed)
+        return LoaderResult(name, True, elapsed, result=result)
     except Exception as e:
-        elapsed = round(time.time() - start, 2)
-        logger.exception(f"❌ Loader {name} failed after {elapsed}s")
-        return None
+        elapsed = round(time.perf_counter() - start, 2)
+        logger.exception("❌ Loader %s failed after %ss", name, elapsed)
+        return LoaderResult(name, False, elapsed, exc=e)
+
+
+# Supplemental loaders. Each one is an independent Shopify fetch writing its own tables,
+# so they are run side by side rather than one after another.
+
+EXTRA_LOADERS: Tuple[Tuple[str, Callable[[dlt.Pipeline], Any]], ...] = (
+    ("pages", load_pages),
+    ("pages_metafields", load_pages_metafields),
+    ("collections_metafields", load_collections_metafields),
+    # Exported with a bulk operation, the only loader that uses one (one bulk query per shop at a time)
+    ("products_metafields", load_products_metafields),
+    ("blogs", load_blogs),
+    ("articles", load_articles),
+    ("inventory_levels_gql", load_inventory_levels_gql),
+    ("b2b_companies", load_b2b_companies),
+    ("b2b_company_locations", load_b2b_company_locations),
+)
+
+MAX_LOADER_WORKERS = 6
+
+
+def get_loader_pipeline(name, pipeline):
+    # A dlt pipeline is not safe to run from several threads at once, so every loader gets
+    # its own pipeline (own working dir and state) writing into the same dataset.
+    loader_pipeline = get_pipeline(f"{pipeline.pipeline_name}_{name}", pipeline.dataset_name)
+    # Loaders fully replace their tables and keep no incremental state, so there is
+    # nothing to restore from Postgres before each run.
+    loader_pipeline.config.restore_from_destination = False
+    return loader_pipeline
+
+
+# Content loaders change rarely, so a successful load is reused for a while instead of
+# re-fetching everything on every scheduled run.
+CACHED_LOADERS = frozenset(
+    {"pages", "pages_metafields", "collections_metafields", "blogs", "articles"}
+)
+LOADER_CACHE_TTL = timedelta(hours=1)
+
+
+def loaded_recently(loader_pipeline) -> bool:
+    # The last trace is persisted in the pipeline working dir, so this survives restarts
+    trace = loader_pipeline.last_trace
+    if trace is None or trace.finished_at is None:
+        return False
+    if any(step.step_exception for step in trace.steps):
+        return False
+    return pendulum.now() - trace.finished_at < LOADER_CACHE_TTL
+
+
+def run_loader_in_own_pipeline(name, fn, pipeline):
+    loader_pipeline = get_loader_pipeline(name, pipeline)
+    if name in CACHED_LOADERS and loaded_recently(loader_pipeline):
+        logger.info(
+            "⏭️ Skipping loader %s, loaded at %s", name, loader_pipeline.last_trace.finished_at
+        )
+        return LoaderResult(name, True, 0.0)
+    return run_loader(name, fn, loader_pipeline)
+
+
+def run_loaders_parallel(loaders, pipeline) -> Dict[str, LoaderResult]:
+    logger.debug("Running %d loaders with %d workers", len(loaders), MAX_LOADER_WORKERS)
+    results: Dict[str, LoaderResult] = {}
+    with ThreadPoolExecutor(max_workers=MAX_LOADER_WORKERS) as ex:
+        futures = {
+            ex.submit(run_loader_in_own_pipeline, name, fn, pipeline): name
+            for name, fn in loaders
+        }
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+
+    # Every loader gets its chance to run, failures are reported together at the end
+    failures = [r for r in results.values() if not r.ok]
+    if failures:
+        raise LoaderFailures(failures)
+    return results
 
 
 # Core pipeline logic
 def load_all_resources(resources: List[str], start_date: TAnyDateTime) -> None:
     logger.info("Starting load_all_resources")
-    logger.info(f"Resources requested: {resources}")
-    logger.info(f"Start date: {start_date}")
+    logger.info("Resources requested: %s", resources)
+    logger.info("Start date: %s", start_date)
 
-    pipeline = dlt.pipeline(
-        pipeline_name="shopify_local",
-        destination="postgres",
-        dataset_name="shopify_dlt_data",
-    )
+    pipeline = get_pipeline()
 
     try:
         logger.info("Initializing Shopify source...")
@@ -64,18 +196,10 @@ def load_all_resources(resources: List[str], start_date: TAnyDateTime) -> None:
         # Core Shopify load (orders, products, customers, etc.)
         load_info = pipeline.run(source)
         logger.info("✅ Core pipeline run complete.")
-        logger.info(f"Load info summary:\n{load_info}")
+        logger.info("Load info summary:\n%s", load_info)
 
         # Run extra loaders
-        run_loader("pages", load_pages, pipeline)
-        run_loader("pages_metafields", load_pages_metafields, pipeline)
-        run_loader("collections_metafields", load_collections_metafields, pipeline)
-        # run_loader("products_metafields", load_products_metafields, pipeline)
-        run_loader("blogs", load_blogs, pipeline)
-        run_loader("articles", load_articles, pipeline)
-        run_loader("inventory_levels_gql", load_inventory_levels_gql, pipeline)
-        run_loader("b2b_companies", load_b2b_companies, pipeline)
-        run_loader("b2b_company_locations", load_b2b_company_locations, pipeline)
+        run_loaders_parallel(EXTRA_LOADERS, pipeline)
 
         logger.info("✅ All custom Shopify resources loaded successfully.")
         logger.info("Data stored in: shopify.duckdb")
@@ -87,76 +211,136 @@ def load_all_resources(resources: List[str], start_date: TAnyDateTime) -> None:
 
 # Backloading function, this backfills the data in weekly chunks
 
-def incremental_load_with_backloading() -> None:
-    pipeline = dlt.pipeline(
-        pipeline_name="shopify_local",
-        destination="postgres",
-        dataset_name="shopify_dlt_data",
+def weekly_ranges(
+    start: pendulum.DateTime, end: pendulum.DateTime
+) -> List[Tuple[pendulum.DateTime, pendulum.DateTime]]:
+    # All chunk edges are computed up front from the chunk index, the last chunk is cut at `end`
+    week = timedelta(weeks=1)
+    n_chunks = max(ceil((end - start).total_seconds() / week.total_seconds()), 0)
+    edges = [start + week * i for i in range(n_chunks)] + [end]
+    return list(zip(edges[:-1], edges[1:]))
+
+
+MAX_CHUNK_WORKERS = 4
+
+
+def extract_chunk(idx, start_date, end_date, min_start_date, pipeline):
+    # Extraction is bound by Shopify API latency, so it is the part worth running in parallel.
+    # Each chunk gets its own pipeline so extracted packages and state never collide.
+    chunk_pipeline = get_pipeline(f"{pipeline.pipeline_name}_chunk_{idx}", pipeline.dataset_name)
+    extract_info = chunk_pipeline.extract(
+        shopify_source(
+            start_date=start_date, end_date=end_date, created_at_min=min_start_date
+        ).with_resources(*CORE_RESOURCES)
     )
+    return chunk_pipeline, extracted_rows(extract_info)
 
-    min_start_date = current_start_date = pendulum.datetime(2025, 10, 1)
-    max_end_date = pendulum.now()
 
-    ranges: List[Tuple[pendulum.DateTime, pendulum.DateTime]] = []
-    while current_start_date < max_end_date:
-        end_date = min(current_start_date.add(weeks=1), max_end_date)
-        ranges.append((current_start_date, end_date))
-        current_start_date = end_date
+def extracted_rows(extract_info) -> int:
+    # Counts data rows only, dlt's own state table is written even for an empty extract
+    return sum(
+        metrics.items_count
+        for load_metrics in extract_info.metrics.values()
+        for step in load_metrics
+        for table, metrics in step["table_metrics"].items()
+        if not table.startswith("_dlt")
+    )
 
-    logger.info(f"Starting backfill with {len(ranges)} weekly chunks")
 
-    for idx, (start_date, end_date) in enumerate(ranges, start=1):
-        logger.info(f"🧩 Chunk {idx}/{len(ranges)}: {start_date} → {end_date}")
+# Completed weekly chunks are kept in the pipeline's local state (stored in its working dir),
+# so a backfill that was interrupted or had failed chunks only re-runs what is missing.
+BACKFILL_STATE_KEY = "backfilled_chunks"
 
-        # Core Shopify load
-        data = shopify_source(
-            start_date=start_date, end_date=end_date, created_at_min=min_start_date
-        ).with_resources("orders", "customers", "products")
 
-        try:
-            load_info = pipeline.run(data)
-            logger.info(f"✅ Core chunk {idx} complete: {load_info}")
+def chunk_key(start_date: pendulum.DateTime, end_date: pendulum.DateTime) -> str:
+    return f"{start_date.isoformat()}/{end_date.isoformat()}"
+
 
-            # Include supplemental loaders per chunk
-            run_loader("pages", load_pages, pipeline)
-            run_loader("pages_metafields", load_pages_metafields, pipeline)
-            run_loader("collections_metafields", load_collections_metafields, pipeline)
-            # run_loader("products_metafields", load_products_metafields, pipeline)
-            run_loader("blogs", load_blogs, pipeline)
-            run_loader("articles", load_articles, pipeline)
-            run_loader("b2b_companies", load_b2b_companies, pipeline)
-            run_loader("inventory_levels_gql", load_inventory_levels_gql, pipeline)
-            run_loader("b2b_company_locations", load_b2b_company_locations, pipeline)
+def completed_chunks(pipeline) -> Set[str]:
+    try:
+        return set(pipeline.get_local_state_val(BACKFILL_STATE_KEY))
+    except KeyError:
+        return set()
+
+
+def incremental_load_with_backloading() -> None:
+    pipeline = get_pipeline()
+
+    min_start_date = pendulum.datetime(2025, 10, 1)
+    max_end_date = pendulum.now()
 
+    ranges = weekly_ranges(min_start_date, max_end_date)
 
-            logger.info(f"✅ Supplemental loaders complete for chunk {idx}")
+    done = completed_chunks(pipeline)
+    pending = [
+        (idx, start_date, end_date)
+        for idx, (start_date, end_date) in enumerate(ranges, start=1)
+        if chunk_key(start_date, end_date) not in done
+    ]
 
-        except Exception:
-            logger.exception(f"❌ Failed on chunk {idx} ({start_date} → {end_date})")
-            break
+    logger.info(
+        "Starting backfill with %d weekly chunks, %d already loaded",
+        len(ranges),
+        len(ranges) - len(pending),
+    )
+
+    # Chunks are extracted concurrently, each into its own pipeline working dir. Normalize and
+    # load then run one chunk at a time in order, so merges into the shared tables never overlap.
+    with ThreadPoolExecutor(max_workers=MAX_CHUNK_WORKERS) as ex:
+        futures = [
+            ex.submit(extract_chunk, idx, start_date, end_date, min_start_date, pipeline)
+            for idx, start_date, end_date in pending
+        ]
+
+        for (idx, start_date, end_date), future in zip(pending, futures):
+            logger.info("🧩 Chunk %d/%d: %s → %s", idx, len(ranges), start_date, end_date)
+
+            try:
+                chunk_pipeline, rows = future.result()
+                if rows == 0:
+                    # Quiet weeks are common, no need to pay for normalize and load on them
+                    logger.info("Chunk %d is empty, skipping load", idx)
+                    chunk_pipeline.drop_pending_packages()
+                else:
+                    chunk_pipeline.normalize()
+                    load_info = chunk_pipeline.load()
+                    logger.info("✅ Core chunk %d complete: %s", idx, load_info)
+
+            except Exception:
+                # The chunk is not marked as done, so the next backfill retries it
+                logger.exception("❌ Failed on chunk %d (%s → %s)", idx, start_date, end_date)
+                continue
+
+            # The last chunk ends at "now" and will never match again, so it is not recorded
+            if end_date < max_end_date:
+                done.add(chunk_key(start_date, end_date))
+                pipeline.set_local_state_val(BACKFILL_STATE_KEY, sorted(done))
 
     # After all chunks, run final incremental sync
     logger.info("Switching to incremental load from latest backfill point...")
     load_info = pipeline.run(
         shopify_source(
             start_date=max_end_date, created_at_min=min_start_date
-        ).with_resources("orders", "customers", "products")
+        ).with_resources(*CORE_RESOURCES)
     )
-    logger.info(f"✅ Incremental load complete: {load_info}")
+    logger.info("✅ Incremental load complete: %s", load_info)
+
+    # Supplemental loaders don't depend on the chunk date range, so they run once after the backfill
+    run_loaders_parallel(EXTRA_LOADERS, pipeline)
+    logger.info("✅ Supplemental loaders complete")
 
 
 # Partner API, this is added by DLT by default to the pipeline logic. Currently unused but worth keeping in the file for future reference
 
+PARTNER_PAGE_SIZE = 100
+
+
 def load_partner_api_transactions() -> None:
     """Load transactions from the Shopify Partner API."""
-    pipeline = dlt.pipeline(
-        pipeline_name="shopify_partner",
-        destination="postgres",
-        dataset_name="shopify_partner_data",
-    )
+    pipeline = get_pipeline("shopify_partner", "shopify_partner_data")
 
-    query = """query Transactions($after: String, first: 100) {
-        transactions(after: $after) {
+    query = """query Transactions($after: String, $first: Int!) {
+        transactions(after: $after, first: $first) {
             edges { cursor node { id } }
         }
     }"""
@@ -166,6 +350,7 @@ def load_partner_api_transactions() -> None:
         data_items_path="data.transactions.edges[*].node",
         pagination_cursor_path="data.transactions.edges[-1].cursor",
         pagination_variable_name="after",
+        variables={"first": PARTNER_PAGE_SIZE},
     )
 
     load_info = pipeline.run(resource)
@@ -175,7 +360,6 @@ def load_partner_api_transactions() -> None:
 # Initialisation of functions
 
 if __name__ == "__main__":
-    resources = ["products", "orders", "customers"]
-    load_all_resources(resources, start_date="2025-10-10")
+    load_all_resources(list(CORE_RESOURCES), start_date="2025-10-10")
     # incremental_load_with_backloading()
     # load_partner_api_transactions()
@@ -1,15 +1,47 @@
 import dlt
 import requests
+from dlt.common import json
 import time
 import logging
-import re
+import operator
+import random
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional, Tuple
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# 429s and transient 5xx are retried with exponential backoff, honouring Shopify's Retry-After.
+# POST is included for the read-only GraphQL queries; mutations go through MUTATION_SESSION instead.
+RETRY = Retry(
+    total=6,
+    backoff_factor=0.5,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset(["GET", "POST"]),
+    respect_retry_after_header=True,
+)
+
+# Shared session for every Shopify call in this module, so requests reuse keep-alive connections
+# instead of a new TLS handshake each. The pool is sized for the loaders running side by side.
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=RETRY))
+
+# No transport retries: a mutation that reached Shopify but timed out on the way back must not be
+# sent a second time (a repeated bulkOperationRunQuery fails as "already in progress")
+MUTATION_SESSION = requests.Session()
+MUTATION_SESSION.mount("https://", HTTPAdapter(max_retries=0))
+
+# Stand-in for missing nested objects in the flatten loops. Shared, so it must never be mutated.
+EMPTY: dict = {}
+
 
 def clean_gid(value):
     """Extract numeric ID from Shopify GID (e.g. gid://shopify/Company/12345 → 12345)."""
     if isinstance(value, str) and value.startswith("gid://shopify/"):
-        match = re.search(r"/(\d+)$", value)
-        if match:
-            return match.group(1)
+        # Called for every scalar of every B2B record, so a plain split rather than a regex search
+        numeric_id = value.rpartition("/")[2]
+        if numeric_id.isdigit():
+            return numeric_id
     return value
 
 
@@ -25,6 +57,263 @@ def clean_record_gids(record: dict) -> dict:
             cleaned[k] = clean_gid(v)
     return cleaned
 
+
+# Shopify's maximum for `first`. Flat connections (pages, blogs, inventory levels) stay well under
+# the 1000-point query cost at this size, so fewer, larger pages are cheaper overall.
+GQL_PAGE_SIZE = 250
+# A page Shopify rejects as over the cost cap is halved and retried, down to this size
+MIN_GQL_PAGE_SIZE = 25
+
+
+# GraphQL throttling is cost based: a throttled query still returns 200, with a THROTTLED error,
+# and every response reports the cost bucket under extensions.cost.throttleStatus.
+GQL_MAX_THROTTLE_RETRIES = 6
+
+
+def gql_error_codes(payload: dict) -> set:
+    """Shopify's extensions.code for each error in a GraphQL payload, e.g. {"THROTTLED"}."""
+    return {(error.get("extensions") or EMPTY).get("code") for error in payload.get("errors") or ()}
+
+
+def gql_throttle_wait(payload: dict) -> float:
+    """Seconds until the cost bucket holds enough points for another query like this one (0 if it already does)."""
+    cost = (payload.get("extensions") or EMPTY).get("cost") or EMPTY
+    status = cost.get("throttleStatus") or EMPTY
+    requested = cost.get("requestedQueryCost")
+    available = status.get("currentlyAvailable")
+    restore_rate = status.get("restoreRate")
+    if requested is None or available is None or not restore_rate or available >= requested:
+        return 0.0
+    if requested > status.get("maximumAvailable", requested):
+        # Over the cost cap; the query is rejected outright and waiting won't help
+        return 0.0
+    return (requested - available) / restore_rate
+
+
+class ShopifyGraphQLError(Exception):
+    pass
+
+
+@lru_cache(maxsize=None)
+def gql_body_prefix(query: str) -> bytes:
+    """The serialized `{"query": ...` head of a request body, open for the variables to be appended."""
+    return json.dumpb({"query": query})[:-1] + b',"variables":'
+
+
+def post_gql(gql_url, headers, query, variables=None, timeout=60, session=SESSION) -> dict:
+    """POST a GraphQL query and return the decoded payload, waiting out Shopify's cost-based throttling."""
+    # Queries are module constants, so only the variables are serialized per request. The headers
+    # already carry Content-Type: application/json.
+    body = gql_body_prefix(query) + json.dumpb(variables or EMPTY) + b"}"
+    for attempt in range(GQL_MAX_THROTTLE_RETRIES):
+        resp = session.post(gql_url, headers=headers, data=body, timeout=timeout)
+        resp.raise_for_status()
+        payload = json.loadb(resp.content)
+
+        wait = gql_throttle_wait(payload)
+        if "THROTTLED" not in gql_error_codes(payload):
+            # Pace the next call rather than letting it bounce off an empty bucket
+            if wait:
+                time.sleep(wait)
+            return payload
+
+        time.sleep(wait or 2 ** attempt + random.random())
+
+    raise ShopifyGraphQLError(f"Still throttled after {GQL_MAX_THROTTLE_RETRIES} attempts: {payload.get('errors')}")
+
+
+def fetch_gql_page(gql_url, headers, query, variables, path, timeout=60):
+    """
+    POST one GraphQL page and return the connection found at `path`, with the variables it was
+    fetched with. The page is halved while Shopify rejects it with MAX_COST_EXCEEDED.
+    """
+    while True:
+        payload = post_gql(gql_url, headers, query, variables, timeout)
+        first = variables["first"]
+        if "MAX_COST_EXCEEDED" not in gql_error_codes(payload) or first <= MIN_GQL_PAGE_SIZE:
+            break
+        variables = dict(variables, first=max(first // 2, MIN_GQL_PAGE_SIZE))
+        logging.info("↘️ Query cost too high, retrying with first=%d", variables["first"])
+
+    block = payload.get("data")
+    for key in path:
+        block = (block or {}).get(key)
+    # Raised rather than read as an empty page, so a `replace` resource never truncates its table
+    if payload.get("errors") or block is None:
+        raise ShopifyGraphQLError(f"No {'.'.join(path)} in response: {payload.get('errors')}")
+    return block, variables
+
+
+def paginate_gql_pages(gql_url, headers, query, path, variables=None, page_size=GQL_PAGE_SIZE, timeout=60):
+    """
+    Yield the nodes of a cursor-paginated GraphQL connection, one list per page.
+    The next page is requested in the background as soon as the current one arrives, so the
+    network round-trip overlaps with dlt consuming the rows already in hand.
+    """
+    variables = {"first": page_size, "after": None, **(variables or {})}
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        future = ex.submit(fetch_gql_page, gql_url, headers, query, variables, path, timeout)
+        while future:
+            # Carries over a page size that had to shrink, so later pages start from it
+            block, variables = future.result()
+            future = None
+            page_info = block["pageInfo"]
+            if page_info["hasNextPage"]:
+                variables = dict(variables, after=page_info["endCursor"])
+                future = ex.submit(fetch_gql_page, gql_url, headers, query, variables, path, timeout)
+
+            yield [edge["node"] for edge in block["edges"]]
+
+
+def paginate_gql(gql_url, headers, query, path, variables=None, page_size=GQL_PAGE_SIZE, timeout=60):
+    """Yield the nodes of a cursor-paginated GraphQL connection one at a time (see paginate_gql_pages)."""
+    for nodes in paginate_gql_pages(gql_url, headers, query, path, variables, page_size, timeout):
+        yield from nodes
+
+
+# Metafield fields requested over GraphQL, mapped back to the REST metafield shape by rest_metafield
+METAFIELD_FIELDS = "id namespace key value type description createdAt updatedAt"
+
+# Shopify rejects queries whose requested cost is over 1000 points. Nested connections multiply,
+# so 25 owners x 30 metafields stays under it; owners with more are paged separately.
+METAFIELD_OWNERS_PAGE_SIZE = 25
+METAFIELDS_PER_OWNER = 30
+
+# Objects of a connection (products, pages, collections) with their first metafields
+OWNER_METAFIELDS_QUERY = """
+query OwnerMetafields($first: Int!, $after: String, $query: String, $metafields: Int!) {
+  %%s(first: $first, after: $after, query: $query) {
+    edges {
+      node {
+        id
+        metafields(first: $metafields) {
+          edges { node { %s } }
+          pageInfo { hasNextPage endCursor }
+        }
+      }
+    }
+    pageInfo { hasNextPage endCursor }
+  }
+}
+""" % METAFIELD_FIELDS
+
+# The rest of one object's metafields, for the rare owner with more than fit in the page above
+MORE_METAFIELDS_QUERY = """
+query MoreMetafields($id: ID!, $first: Int!, $after: String) {
+  node(id: $id) {
+    ... on HasMetafields {
+      metafields(first: $first, after: $after) {
+        edges { node { %s } }
+        pageInfo { hasNextPage endCursor }
+      }
+    }
+  }
+}
+""" % METAFIELD_FIELDS
+
+
+def rest_metafield(node: dict, owner_id, owner_resource: str) -> dict:
+    """Shape a GraphQL metafield node like the REST metafields.json record, so table columns don't change."""
+    return {
+        "id": int(clean_gid(node["id"])),
+        "namespace": node["namespace"],
+        "key": node["key"],
+        "value": node["value"],
+        "type": node["type"],
+        "description": node.get("description"),
+        "owner_id": owner_id,
+        "owner_resource": owner_resource,
+        "created_at": node["createdAt"],
+        "updated_at": node["updatedAt"],
+        "admin_graphql_api_id": node["id"],
+    }
+
+
+def paginate_metafields(gql_url, headers, connection, owner_resource, search=None):
+    """
+    Yield REST-shaped metafield records for every object of a GraphQL connection, e.g. "products".
+    `search` is passed as the connection's `query` filter.
+    """
+    query = OWNER_METAFIELDS_QUERY % connection
+    variables = {"query": search, "metafields": METAFIELDS_PER_OWNER}
+    for owner in paginate_gql(
+        gql_url, headers, query, (connection,), variables=variables, page_size=METAFIELD_OWNERS_PAGE_SIZE
+    ):
+        owner_id = int(clean_gid(owner["id"]))
+        metafields = owner["metafields"]
+        nodes = [edge["node"] for edge in metafields["edges"]]
+        if metafields["pageInfo"]["hasNextPage"]:
+            more = {"id": owner["id"], "after": metafields["pageInfo"]["endCursor"]}
+            nodes.extend(
+                paginate_gql(gql_url, headers, MORE_METAFIELDS_QUERY, ("node", "metafields"), more)
+            )
+
+        for node in nodes:
+            yield rest_metafield(node, owner_id, owner_resource)
+
+
+# Bulk operations run a query server side, free of the cost limit, and publish the result as a
+# JSONL file. Nested connection nodes become lines of their own, linked to the parent by __parentId.
+BULK_POLL_INTERVAL = 5
+BULK_MAX_WAIT = 2 * 60 * 60
+BULK_RUNNING_STATUSES = frozenset({"CREATED", "RUNNING"})
+
+BULK_RUN_MUTATION = """
+mutation RunBulkQuery($query: String!) {
+  bulkOperationRunQuery(query: $query) {
+    bulkOperation { id status }
+    userErrors { field message }
+  }
+}
+"""
+
+CURRENT_BULK_OPERATION_QUERY = """
+query {
+  currentBulkOperation { id status errorCode objectCount url }
+}
+"""
+
+
+def run_bulk_query(gql_url, headers, query, poll_interval=BULK_POLL_INTERVAL, max_wait=BULK_MAX_WAIT):
+    """
+    Run `query` as a bulk operation and yield the records of its JSONL result as they download.
+    Only one bulk query can run per shop at a time, so this is kept to loaders that don't run side by side.
+    """
+    payload = post_gql(gql_url, headers, BULK_RUN_MUTATION, {"query": query}, session=MUTATION_SESSION)
+    run = (payload.get("data") or EMPTY).get("bulkOperationRunQuery") or EMPTY
+    if payload.get("errors") or run.get("userErrors") or not run.get("bulkOperation"):
+        raise RuntimeError(f"Bulk operation rejected: {payload.get('errors') or run.get('userErrors')}")
+
+    operation_id = run["bulkOperation"]["id"]
+    logging.info("⏳ Started bulk operation %s", operation_id)
+    deadline = time.monotonic() + max_wait
+    while True:
+        time.sleep(poll_interval)
+        payload = post_gql(gql_url, headers, CURRENT_BULK_OPERATION_QUERY, timeout=30)
+        operation = (payload.get("data") or EMPTY).get("currentBulkOperation") or EMPTY
+        if operation.get("id") != operation_id:
+            raise RuntimeError(f"Bulk operation {operation_id} is no longer the current one")
+        if operation["status"] == "COMPLETED":
+            break
+        if operation["status"] not in BULK_RUNNING_STATUSES:
+            raise RuntimeError(f"Bulk operation {operation_id} {operation['status']}: {operation.get('errorCode')}")
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Bulk operation {operation_id} still {operation['status']} after {max_wait}s")
+
+    logging.info("📦 Bulk operation %s completed with %s objects", operation_id, operation.get("objectCount"))
+    # No url means the query matched nothing
+    if not operation.get("url"):
+        return
+
+    # The result is a signed download URL, so the Shopify auth headers are not sent
+    with SESSION.get(operation["url"], stream=True, timeout=60) as resp:
+        resp.raise_for_status()
+        for line in resp.iter_lines():
+            if line:
+                yield json.loadb(line)
+
+
+@lru_cache(maxsize=1)
 def get_base_shop_domain() -> str:
     """
     Returns the shop domain stripped of protocol and trailing slashes.
@@ -34,493 +323,342 @@ def get_base_shop_domain() -> str:
     return shop_url.replace("https://", "").replace("http://", "").strip("/")
 
 
-def load_inventory_levels_gql(pipeline: dlt.Pipeline) -> None:
-    """Loads inventory levels for the shop’s single location (Head Office)."""
-    import requests
-    import logging
-
-    try:
-        shop_domain = get_base_shop_domain()
-        access_token = dlt.config.get("sources.shopify_dlt.private_app_password")
-        if not shop_domain or not access_token:
-            logging.warning("⚠️ Missing Shopify credentials; skipping inventory_levels_gql.")
-            return
-
-        gql_url = f"https://{shop_domain}/admin/api/2024-01/graphql.json"
-        headers = {
-            "X-Shopify-Access-Token": access_token,
-            "Content-Type": "application/json",
-        }
+class ShopifyContext(NamedTuple):
+    gql_url: str
+    rest_url: str
+    headers: Dict[str, str]
 
-        # Step 1 — Get the one and only location dynamically
-        loc_query = """
-        query {
-          locations(first: 1) {
-            edges {
-              node {
-                id
-                name
-              }
-            }
-          }
-        }
-        """
-        loc_resp = requests.post(gql_url, headers=headers, json={"query": loc_query}, timeout=30)
-        loc_resp.raise_for_status()
-        loc_data = loc_resp.json()
-        edges = (loc_data.get("data") or {}).get("locations", {}).get("edges", [])
-
-        if not edges:
-            logging.error("❌ No locations found — check read_locations scope.")
-            return
-
-        head_office = edges[0]["node"]
-        head_office_gid = head_office["id"]
-        head_office_name = head_office["name"]
-        logging.info(f"🏬 Using location: {head_office_name} ({head_office_gid})")
-
-        # Step 2 — Query inventory levels for that location
-        query = """
-        query GetInventoryLevels($locationId: ID!, $first: Int!, $after: String) {
-          location(id: $locationId) {
-            inventoryLevels(first: $first, after: $after) {
-              edges {
-                node {
-                  id
-                  quantities(names: ["available", "incoming", "committed", "damaged", "on_hand"]) {
-                    name
-                    quantity
-                  }
-                  item { id sku }
-                }
-              }
-              pageInfo { hasNextPage endCursor }
-            }
-          }
-        }
-        """
-
-        @dlt.resource(write_disposition="replace", name="inventory_levels")
-        def inventory_levels_resource():
-            after = None
-            total = 0
-
-            while True:
-                resp = requests.post(
-                    gql_url,
-                    headers=headers,
-                    json={"query": query, "variables": {"locationId": head_office_gid, "first": 100, "after": after}},
-                    timeout=60,
-                )
-                resp.raise_for_status()
-                data = resp.json().get("data", {}).get("location", {})
-                if not data:
-                    logging.warning("⚠️ No location data in response — skipping batch.")
-                    break
-
-                inv_levels = data.get("inventoryLevels", {})
-                edges = inv_levels.get("edges", [])
-                if not edges:
-                    break
-
-                for edge in edges:
-                    node = edge.get("node")
-                    if node:
-                        node["location_id"] = head_office_gid
-                        node["location_name"] = head_office_name
-                        total += 1
-                        yield node
-
-                page_info = inv_levels.get("pageInfo", {})
-                if not page_info.get("hasNextPage"):
-                    break
-                after = page_info.get("endCursor")
-
-            logging.info(f"✅ Finished loading {total} inventory levels from {head_office_name}.")
-
-        pipeline.run(inventory_levels_resource())
-
-    except Exception as e:
-        logging.exception(f"❌ Failed to load inventory levels: {e}")
 
-def load_pages(pipeline: dlt.Pipeline) -> None:
-    try:
-        shop_domain = get_base_shop_domain()
-        access_token = dlt.config.get("sources.shopify_dlt.private_app_password")
-        if not shop_domain or not access_token:
-            return
-
-        gql_url = f"https://{shop_domain}/admin/api/2024-01/graphql.json"
-        headers = {"X-Shopify-Access-Token": access_token, "Content-Type": "application/json"}
-
-        query = """
-        query GetPages($first: Int!, $after: String) {
-          pages(first: $first, after: $after) {
-            edges { node { id title handle createdAt updatedAt } }
-            pageInfo { hasNextPage endCursor }
-          }
-        }
-        """
-
-        @dlt.resource(write_disposition="replace", name="pages")
-        def pages_resource():
-            after = None
-            total = 0
-
-            while True:
-                resp = requests.post(
-                    gql_url,
-                    headers=headers,
-                    json={"query": query, "variables": {"first": 100, "after": after}},
-                )
-                resp.raise_for_status()
-                data = resp.json()["data"]["pages"]
-
-                batch_count = len(data["edges"])
-                total += batch_count
-
-                for edge in data["edges"]:
-                    yield edge["node"]
-
-                if not data["pageInfo"]["hasNextPage"]:
-                    break
-                after = data["pageInfo"]["endCursor"]
-
-        shop_url = dlt.config.get("sources.shopify_dlt.shop_url")
-        access_token = dlt.config.get("sources.shopify_dlt.private_app_password")
-        if not shop_url or not access_token:
-            return
-
-        gql_url = f"https://{shop_url.replace('https://','').replace('http://','').strip('/')}/admin/api/2024-01/graphql.json"
-        headers = {"X-Shopify-Access-Token": access_token, "Content-Type": "application/json"}
-
-        query = """
-        query GetPages($first: Int!, $after: String) {
-          pages(first: $first, after: $after) {
-            edges {
-              node {
-                id
-                title
-                handle
-                createdAt
-                updatedAt
-              }
-            }
-            pageInfo {
-              hasNextPage
-              endCursor
-            }
+@lru_cache(maxsize=None)
+def shopify_context(api_version: str = "2024-01") -> Optional[ShopifyContext]:
+    """
+    Returns the Admin API URLs and auth headers for `api_version`, or None if credentials are missing.
+    Cached, so config is read once per process rather than in every loader. The headers dict is
+    shared between callers and must not be modified.
+    """
+    shop_domain = get_base_shop_domain()
+    access_token = dlt.config.get("sources.shopify_dlt.private_app_password")
+    if not shop_domain or not access_token:
+        return None
+
+    rest_url = f"https://{shop_domain}/admin/api/{api_version}"
+    headers = {"X-Shopify-Access-Token": access_token, "Content-Type": "application/json"}
+    return ShopifyContext(f"{rest_url}/graphql.json", rest_url, headers)
+
+
+# The shop's one and only location (Head Office)
+HEAD_OFFICE_QUERY = """
+query {
+  locations(first: 1) {
+    edges {
+      node {
+        id
+        name
+      }
+    }
+  }
+}
+"""
+
+
+# Name of a configured location, so location_name always matches Shopify
+LOCATION_NAME_QUERY = """
+query GetLocationName($id: ID!) {
+  location(id: $id) { id name }
+}
+"""
+
+
+@lru_cache(maxsize=1)
+def head_office_location() -> Optional[Tuple[str, str]]:
+    """
+    Returns (gid, name) of the Head Office location, or None if the shop has none.
+    Set sources.shopify_dlt.head_office_location_id to skip listing locations, and
+    head_office_location_name as well to skip the lookup entirely. Queried once per process.
+    """
+    ctx = shopify_context()
+    location_id = dlt.config.get("sources.shopify_dlt.head_office_location_id")
+    if location_id:
+        location_name = dlt.config.get("sources.shopify_dlt.head_office_location_name")
+        if location_name:
+            return location_id, location_name
+
+        loc_data = post_gql(ctx.gql_url, ctx.headers, LOCATION_NAME_QUERY, {"id": location_id}, timeout=30)
+        location = (loc_data.get("data") or {}).get("location")
+        return (location["id"], location["name"]) if location else None
+
+    loc_data = post_gql(ctx.gql_url, ctx.headers, HEAD_OFFICE_QUERY, timeout=30)
+    edges = (loc_data.get("data") or {}).get("locations", {}).get("edges", [])
+    if not edges:
+        return None
+
+    head_office = edges[0]["node"]
+    return head_office["id"], head_office["name"]
+
+
+# Inventory levels for a single location
+INVENTORY_LEVELS_QUERY = """
+query GetInventoryLevels($locationId: ID!, $first: Int!, $after: String) {
+  location(id: $locationId) {
+    inventoryLevels(first: $first, after: $after) {
+      edges {
+        node {
+          id
+          quantities(names: ["available", "incoming", "committed", "damaged", "on_hand"]) {
+            name
+            quantity
           }
+          item { id sku }
         }
-        """
+      }
+      pageInfo { hasNextPage endCursor }
+    }
+  }
+}
+"""
 
-        @dlt.resource(write_disposition="replace", name="pages")
-        def pages_resource():
-            after = None
-            total = 0
 
-            while True:
-                resp = requests.post(
-                    gql_url,
-                    headers=headers,
-                    json={"query": query, "variables": {"first": 100, "after": after}},
-                )
-                resp.raise_for_status()
-                data = resp.json()["data"]["pages"]
+def load_inventory_levels_gql(pipeline: dlt.Pipeline) -> None:
+    """Loads inventory levels for the shop’s single location (Head Office)."""
+    ctx = shopify_context()
+    if not ctx:
+        logging.warning("⚠️ Missing Shopify credentials; skipping inventory_levels_gql.")
+        return
+
+    gql_url, headers = ctx.gql_url, ctx.headers
+
+    head_office = head_office_location()
+    if not head_office:
+        logging.error("❌ No locations found — check read_locations scope.")
+        return
+
+    head_office_gid, head_office_name = head_office
+    logging.info("🏬 Using location: %s (%s)", head_office_name, head_office_gid)
+
+    # Same two columns on every inventory level, merged in with a single update per row
+    location = {"location_id": head_office_gid, "location_name": head_office_name}
+
+    @dlt.resource(write_disposition="replace", name="inventory_levels")
+    def inventory_levels_resource():
+        total = 0
+        # Whole pages are yielded, so dlt handles one item per request instead of one per row
+        for nodes in paginate_gql_pages(
+            gql_url,
+            headers,
+            INVENTORY_LEVELS_QUERY,
+            ("location", "inventoryLevels"),
+            variables={"locationId": head_office_gid},
+        ):
+            for node in nodes:
+                node.update(location)
+            total += len(nodes)
+            yield nodes
+
+        logging.info("✅ Finished loading %d inventory levels from %s.", total, head_office_name)
+
+    pipeline.run(inventory_levels_resource())
+
+
+PAGES_QUERY = """
+query GetPages($first: Int!, $after: String) {
+  pages(first: $first, after: $after) {
+    edges { node { id title handle createdAt updatedAt } }
+    pageInfo { hasNextPage endCursor }
+  }
+}
+"""
 
-                for edge in data["edges"]:
-                    total += 1
-                    yield edge["node"]
 
-                print(f"📄 Loaded {len(data['edges'])} pages (total {total})")
+def load_pages(pipeline: dlt.Pipeline) -> None:
+    ctx = shopify_context()
+    if not ctx:
+        return
 
-                if not data["pageInfo"]["hasNextPage"]:
-                    break
-                after = data["pageInfo"]["endCursor"]
+    gql_url, headers = ctx.gql_url, ctx.headers
 
-            print(f"✅ Finished loading {total} pages")
+    @dlt.resource(write_disposition="replace", name="pages")
+    def pages_resource():
+        total = 0
+        for nodes in paginate_gql_pages(gql_url, headers, PAGES_QUERY, ("pages",)):
+            total += len(nodes)
+            yield nodes
 
-        pipeline.run(pages_resource())
+        logging.info("✅ Finished loading %d pages", total)
 
-    except Exception as e:
-        print(f"❌ Failed to load pages: {e}")
+    pipeline.run(pages_resource())
 
 
 def load_pages_metafields(pipeline: dlt.Pipeline) -> None:
-    try:
-        shop_domain = get_base_shop_domain()
-        access_token = dlt.config.get("sources.shopify_dlt.private_app_password")
-        if not shop_domain or not access_token:
-            return
-
-        base_url = f"https://{shop_domain}/admin/api/2024-01"
-        headers = {"X-Shopify-Access-Token": access_token, "Content-Type": "application/json"}
-
-        pages_url = f"{base_url}/pages.json?limit=250"
-        page_ids = []
-        while pages_url:
-            resp = requests.get(pages_url, headers=headers)
-            resp.raise_for_status()
-            data = resp.json()["pages"]
-            page_ids.extend([p["id"] for p in data])
-
-            link_header = resp.headers.get("Link", "")
-            next_url = None
-            if 'rel="next"' in link_header:
-                next_url = link_header.split(";")[0].strip("<>")
-            pages_url = next_url
-
-        @dlt.resource(write_disposition="replace", name="pages_metafields")
-        def pages_metafields_resource():
-            for pid in page_ids:
-                url = f"{base_url}/pages/{pid}/metafields.json"
-                resp = requests.get(url, headers=headers)
-                resp.raise_for_status()
-                for mf in resp.json()["metafields"]:
-                    mf["page_id"] = pid
-                    yield mf
-
-        pipeline.run(pages_metafields_resource())
-
-    except Exception as e:
-        print(f"❌ Failed to load pages metafields: {e}")
+    # Pages expose metafields over GraphQL from 2024-04 on
+    ctx = shopify_context("2025-10")
+    if not ctx:
+        return
+
+    @dlt.resource(write_disposition="replace", name="pages_metafields")
+    def pages_metafields_resource():
+        for mf in paginate_metafields(ctx.gql_url, ctx.headers, "pages", "page"):
+            mf["page_id"] = mf["owner_id"]
+            yield mf
+
+    pipeline.run(pages_metafields_resource())
 
 
 def load_collections_metafields(pipeline: dlt.Pipeline) -> None:
-    try:
-        shop_domain = get_base_shop_domain()
-        access_token = dlt.config.get("sources.shopify_dlt.private_app_password")
-        if not shop_domain or not access_token:
-            return
-
-        base_url = f"https://{shop_domain}/admin/api/2024-01"
-        headers = {"X-Shopify-Access-Token": access_token, "Content-Type": "application/json"}
-
-        url = f"{base_url}/custom_collections.json?limit=250"
-        collection_ids = []
-        resp = requests.get(url, headers=headers)
-        resp.raise_for_status()
-        collections = resp.json()["custom_collections"]
-        collection_ids.extend([c["id"] for c in collections])
+    ctx = shopify_context()
+    if not ctx:
+        return
+
+    @dlt.resource(write_disposition="replace", name="collections_metafields")
+    def collections_metafields_resource():
+        # Custom collections only, like the REST custom_collections.json listing this replaced
+        for mf in paginate_metafields(
+            ctx.gql_url, ctx.headers, "collections", "collection", search="collection_type:custom"
+        ):
+            mf["collection_id"] = mf["owner_id"]
+            yield mf
+
+    pipeline.run(collections_metafields_resource())
+
+
+BLOGS_QUERY = """
+query GetBlogs($first: Int!, $after: String) {
+  blogs(first: $first, after: $after) {
+    edges {
+      node { id title handle createdAt updatedAt }
+    }
+    pageInfo { hasNextPage endCursor }
+  }
+}
+"""
 
-        @dlt.resource(write_disposition="replace", name="collections_metafields")
-        def collections_metafields_resource():
-            for cid in collection_ids:
-                resp = requests.get(f"{base_url}/collections/{cid}/metafields.json", headers=headers)
-                resp.raise_for_status()
-                for mf in resp.json()["metafields"]:
-                    mf["collection_id"] = cid
-                    yield mf
 
-        pipeline.run(collections_metafields_resource())
+def load_blogs(pipeline: dlt.Pipeline) -> None:
+    ctx = shopify_context()
+    if not ctx:
+        return
 
-    except Exception as e:
-        print(f"❌ Failed to load collections metafields: {e}")
+    gql_url, headers = ctx.gql_url, ctx.headers
 
+    @dlt.resource(write_disposition="replace", name="blogs")
+    def blogs_resource():
+        total = 0
+        for nodes in paginate_gql_pages(gql_url, headers, BLOGS_QUERY, ("blogs",)):
+            total += len(nodes)
+            yield nodes
+        logging.info("✅ Loaded %d blogs", total)
 
-def load_blogs(pipeline: dlt.Pipeline) -> None:
-    try:
-        shop_domain = get_base_shop_domain()
-        access_token = dlt.config.get("sources.shopify_dlt.private_app_password")
-        if not shop_domain or not access_token:
-            return
-
-        gql_url = f"https://{shop_domain}/admin/api/2024-01/graphql.json"
-        headers = {"X-Shopify-Access-Token": access_token, "Content-Type": "application/json"}
-
-        query = """
-        query GetBlogs($first: Int!, $after: String) {
-          blogs(first: $first, after: $after) {
-            edges {
-              node { id title handle createdAt updatedAt }
-            }
-            pageInfo { hasNextPage endCursor }
-          }
-        }
-        """
-
-        @dlt.resource(write_disposition="replace", name="blogs")
-        def blogs_resource():
-            after = None
-            total = 0
-            while True:
-                resp = requests.post(
-                    gql_url,
-                    headers=headers,
-                    json={"query": query, "variables": {"first": 100, "after": after}},
-                )
-                resp.raise_for_status()
-                data = resp.json()["data"]["blogs"]
-                for edge in data["edges"]:
-                    total += 1
-                    yield edge["node"]
-                if not data["pageInfo"]["hasNextPage"]:
-                    break
-                after = data["pageInfo"]["endCursor"]
-            print(f"✅ Loaded {total} blogs")
-
-        pipeline.run(blogs_resource())
-
-    except Exception as e:
-        print(f"❌ Failed to load blogs: {e}")
+    pipeline.run(blogs_resource())
+
+
+ARTICLES_QUERY = """
+query GetArticles($first: Int!, $after: String) {
+  articles(first: $first, after: $after) {
+    edges {
+      node { id title handle createdAt updatedAt }
+    }
+    pageInfo { hasNextPage endCursor }
+  }
+}
+"""
 
 
 def load_articles(pipeline: dlt.Pipeline) -> None:
-    try:
-        shop_domain = get_base_shop_domain()
-        access_token = dlt.config.get("sources.shopify_dlt.private_app_password")
-        if not shop_domain or not access_token:
-            return
-
-        gql_url = f"https://{shop_domain}/admin/api/2024-01/graphql.json"
-        headers = {"X-Shopify-Access-Token": access_token, "Content-Type": "application/json"}
-
-        query = """
-        query GetArticles($first: Int!, $after: String) {
-          articles(first: $first, after: $after) {
-            edges {
-              node { id title handle createdAt updatedAt }
-            }
-            pageInfo { hasNextPage endCursor }
-          }
+    ctx = shopify_context()
+    if not ctx:
+        return
+
+    gql_url, headers = ctx.gql_url, ctx.headers
+
+    @dlt.resource(write_disposition="replace", name="articles")
+    def articles_resource():
+        total = 0
+        for nodes in paginate_gql_pages(gql_url, headers, ARTICLES_QUERY, ("articles",)):
+            total += len(nodes)
+            yield nodes
+        logging.info("✅ Loaded %d articles", total)
+
+    pipeline.run(articles_resource())
+
+# Every product's metafields, exported in bulk. Product lines only carry an id and are skipped.
+PRODUCTS_METAFIELDS_BULK_QUERY = """
+{
+  products {
+    edges {
+      node {
+        id
+        metafields {
+          edges { node { %s } }
         }
-        """
-
-        @dlt.resource(write_disposition="replace", name="articles")
-        def articles_resource():
-            after = None
-            total = 0
-            while True:
-                resp = requests.post(
-                    gql_url,
-                    headers=headers,
-                    json={"query": query, "variables": {"first": 100, "after": after}},
-                )
-                resp.raise_for_status()
-                data = resp.json()["data"]["articles"]
-                for edge in data["edges"]:
-                    total += 1
-                    yield edge["node"]
-                if not data["pageInfo"]["hasNextPage"]:
-                    break
-                after = data["pageInfo"]["endCursor"]
-            print(f"✅ Loaded {total} articles")
-
-        pipeline.run(articles_resource())
-
-    except Exception as e:
-        print(f"❌ Failed to load articles: {e}")
+      }
+    }
+  }
+}
+""" % METAFIELD_FIELDS
+
 
 def load_products_metafields(pipeline: dlt.Pipeline) -> None:
     """Loads product metafields with progress tracking and defensive timeouts."""
-    try:
-        shop_domain = get_base_shop_domain()
-        access_token = dlt.config.get("sources.shopify_dlt.private_app_password")
-        if not shop_domain or not access_token:
-            logging.warning("⚠️ Missing Shopify credentials; skipping product_metafields.")
-            return
-
-        base_url = f"https://{shop_domain}/admin/api/2024-01"
-        headers = {"X-Shopify-Access-Token": access_token, "Content-Type": "application/json"}
-
-        # Step 1: Collect all product IDs
-        products_url = f"{base_url}/products.json?limit=250"
-        product_ids = []
-        total_pages = 0
-
-        while products_url:
-            total_pages += 1
-            resp = requests.get(products_url, headers=headers, timeout=30)
-            resp.raise_for_status()
-            data = resp.json().get("products", [])
-            product_ids.extend([p["id"] for p in data])
-
-            link_header = resp.headers.get("Link", "")
-            next_url = None
-            if 'rel="next"' in link_header:
-                next_url = link_header.split(";")[0].strip("<>")
-            products_url = next_url
-
-        if not product_ids:
-            logging.warning("⚠️ No products found; skipping metafield load.")
-            return
-
-        # Step 2: Fetch metafields per product
-        start_time = time.time()
-        total_metafields = 0
-        total_products = len(product_ids)
-        last_log_time = start_time
-
-        @dlt.resource(write_disposition="replace", name="products_metafields")
-        def products_metafields_resource():
-            nonlocal total_metafields
-            for i, product_id in enumerate(product_ids, start=1):
-                try:
-                    url = f"{base_url}/products/{product_id}/metafields.json"
-                    resp = requests.get(url, headers=headers, timeout=20)
-                    resp.raise_for_status()
-                    metafields = resp.json().get("metafields", [])
-
-                    for mf in metafields:
-                        mf["product_id"] = product_id
-                        total_metafields += 1
-                        yield mf
-
-                except requests.exceptions.RequestException as re:
-                    logging.warning(f"⚠️ Request error for product {product_id}: {re}")
-                    time.sleep(1)
-                    continue
-
-        pipeline.run(products_metafields_resource())
-
-        total_time = round(time.time() - start_time, 2)
-        logging.info(
-            f"✅ Finished loading {total_metafields} metafields for {total_products} products in {total_time}s."
-        )
-
-    except Exception as e:
-        logging.exception(f"❌ Failed to load product metafields: {e}")
-        shop_domain = get_base_shop_domain()
-        access_token = dlt.config.get("sources.shopify_dlt.private_app_password")
-        if not shop_domain or not access_token:
-            return
-
-        base_url = f"https://{shop_domain}/admin/api/2024-01"
-        headers = {"X-Shopify-Access-Token": access_token, "Content-Type": "application/json"}
-
-        # First, get all product IDs
-        products_url = f"{base_url}/products.json?limit=250"
-        product_ids = []
-        
-        while products_url:
-            resp = requests.get(products_url, headers=headers)
-            resp.raise_for_status()
-            data = resp.json()["products"]
-            product_ids.extend([p["id"] for p in data])
-
-            # Handle pagination
-            link_header = resp.headers.get("Link", "")
-            next_url = None
-            if 'rel="next"' in link_header:
-                next_url = link_header.split(";")[0].strip("<>")
-            products_url = next_url
-
-        @dlt.resource(write_disposition="replace", name="products_metafields")
-        def products_metafields_resource():
-            total_metafields = 0
-            for i, product_id in enumerate(product_ids):
-                    url = f"{base_url}/products/{product_id}/metafields.json"
-                    resp = requests.get(url, headers=headers)
-                    resp.raise_for_status()
-                    
-                    metafields = resp.json().get("metafields", [])
-                    for mf in metafields:
-                        mf["product_id"] = product_id
-                        total_metafields += 1
-                        yield mf
-                    
-
-        pipeline.run(products_metafields_resource())
+    ctx = shopify_context()
+    if not ctx:
+        logging.warning("⚠️ Missing Shopify credentials; skipping product_metafields.")
+        return
+
+    start_time = time.time()
+    total_metafields = 0
+
+    @dlt.resource(write_disposition="replace", name="products_metafields")
+    def products_metafields_resource():
+        nonlocal total_metafields
+        for line in run_bulk_query(ctx.gql_url, ctx.headers, PRODUCTS_METAFIELDS_BULK_QUERY):
+            parent_id = line.get("__parentId")
+            if not parent_id:
+                continue
+            mf = rest_metafield(line, int(clean_gid(parent_id)), "product")
+            mf["product_id"] = mf["owner_id"]
+            total_metafields += 1
+            yield mf
+
+    pipeline.run(products_metafields_resource())
+
+    total_time = round(time.time() - start_time, 2)
+    logging.info("✅ Finished loading %d product metafields in %ss.", total_metafields, total_time)
+
+
+# ✅ One unified query — includes mainContact and full customer info
+COMPANIES_QUERY = """
+query GetCompanies($first: Int!, $after: String) {
+  companies(first: $first, after: $after) {
+    edges {
+      node {
+        id
+        name
+        externalId
+        note
+        createdAt
+        updatedAt
+
+        mainContact {
+          id
+          customer {
+            id
+            firstName
+            lastName
+            createdAt
+            defaultEmailAddress { emailAddress }
+            amountSpent { amount currencyCode }
+          }
+        }
+      }
+    }
+    pageInfo { hasNextPage endCursor }
+  }
+}
+"""
+
+# About 5 points per company (the node plus its nested mainContact objects), so 250 would go over
+# the 1000-point cap on every run
+COMPANIES_PAGE_SIZE = 100
+
 
 def load_b2b_companies(pipeline: dlt.Pipeline) -> None:
     """
@@ -531,131 +669,114 @@ def load_b2b_companies(pipeline: dlt.Pipeline) -> None:
     """
 
 
-    try:
-        shop_domain = get_base_shop_domain()
-        access_token = dlt.config.get("sources.shopify_dlt.private_app_password")
-        if not shop_domain or not access_token:
-            logging.warning("⚠️ Missing Shopify credentials; skipping b2b_companies.")
-            return
+    ctx = shopify_context("2025-10")
+    if not ctx:
+        logging.warning("⚠️ Missing Shopify credentials; skipping b2b_companies.")
+        return
+
+    gql_url, headers = ctx.gql_url, ctx.headers
+
+    # ✅ Single pass over the companies: each company goes to b2b_companies and its main
+    # contact straight after to b2b_main_contacts, so nothing is buffered in memory
+    @dlt.resource(write_disposition="replace", name="b2b_companies")
+    def companies_resource():
+        total = 0
+        for c in paginate_gql(
+            gql_url, headers, COMPANIES_QUERY, ("companies",), page_size=COMPANIES_PAGE_SIZE, timeout=30
+        ):
+            total += 1
+            record =  {
+                "id": c.get("id"),
+                "name": c.get("name"),
+                "externalId": c.get("externalId"),
+                "note": c.get("note"),
+                "createdAt": c.get("createdAt"),
+                "updatedAt": c.get("updatedAt"),
+            }
 
-        gql_url = f"https://{shop_domain}/admin/api/2025-10/graphql.json"
-        headers = {
-            "X-Shopify-Access-Token": access_token,
-            "Content-Type": "application/json",
+            yield clean_record_gids(record)
+
+            mc = c.get("mainContact")
+            if not mc:
+                continue
+
+            cust = mc.get("customer") or EMPTY
+            email_obj = cust.get("defaultEmailAddress") or EMPTY
+            amount_spent = cust.get("amountSpent") or EMPTY
+
+            record = {
+                "contact_id": mc.get("id"),
+                "company_id": c.get("id"),
+                "customer_id": cust.get("id"),
+                "first_name": cust.get("firstName"),
+                "last_name": cust.get("lastName"),
+                "email": email_obj.get("emailAddress"),
+                "customer_created_at": cust.get("createdAt"),
+                "amount_spent_amount": amount_spent.get("amount"),
+                "amount_spent_currency": amount_spent.get("currencyCode"),
+            }
+
+            yield dlt.mark.with_table_name(clean_record_gids(record), "b2b_main_contacts")
+
+        logging.info("✅ Loaded %d B2B companies", total)
+
+    pipeline.run(companies_resource())
+
+
+# ✅ Query: only shallow fields + addresses
+COMPANY_LOCATIONS_QUERY = """
+query GetCompanyLocations($first: Int!, $after: String) {
+  companyLocations(first: $first, after: $after) {
+    edges {
+      node {
+        id
+        name
+        externalId
+        note
+        phone
+        createdAt
+        updatedAt
+        currency
+
+        company { id }
+
+        billingAddress {
+          address1
+          address2
+          city
+          province
+          country
+          zip
         }
 
-        # ✅ One unified query — includes mainContact and full customer info
-        query = """
-        query GetCompanies($first: Int!, $after: String) {
-          companies(first: $first, after: $after) {
-            edges {
-              node {
-                id
-                name
-                externalId
-                note
-                createdAt
-                updatedAt
-
-                mainContact {
-                  id
-                  customer {
-                    id
-                    firstName
-                    lastName
-                    createdAt
-                    defaultEmailAddress { emailAddress }
-                    amountSpent { amount currencyCode }
-                  }
-                }
-              }
-            }
-            pageInfo { hasNextPage endCursor }
-          }
+        shippingAddress {
+          address1
+          address2
+          city
+          province
+          country
+          zip
         }
-        """
-
-        # ✅ Pagination + flattening
-        def fetch_all_companies():
-            after = None
-            all_rows = []
-
-            while True:
-                r = requests.post(
-                    gql_url,
-                    headers=headers,
-                    json={"query": query, "variables": {"first": 100, "after": after}},
-                    timeout=30,
-                )
-                r.raise_for_status()
-                pl = r.json()
-
-                if "errors" in pl:
-                    logging.error(f"❌ Shopify B2B API error: {pl['errors']}")
-                    return []
-
-                block = pl["data"]["companies"]
-                edges = block.get("edges", [])
-                if not edges:
-                    break
-
-                for e in edges:
-                    all_rows.append(e["node"])
-
-                if not block["pageInfo"]["hasNextPage"]:
-                    break
-
-                after = block["pageInfo"]["endCursor"]
-
-            return all_rows
-
-        companies = fetch_all_companies()
-        logging.info(f"✅ Loaded {len(companies)} B2B companies")
-
-        @dlt.resource(write_disposition="replace", name="b2b_companies")
-        def companies_resource():
-            for c in companies:
-                record =  {
-                    "id": c.get("id"),
-                    "name": c.get("name"),
-                    "externalId": c.get("externalId"),
-                    "note": c.get("note"),
-                    "createdAt": c.get("createdAt"),
-                    "updatedAt": c.get("updatedAt"),
-                }
-
-                yield clean_record_gids(record)
-
-        @dlt.resource(write_disposition="replace", name="b2b_main_contacts")
-        def main_contacts_resource():
-            for c in companies:
-                mc = c.get("mainContact")
-                if not mc:
-                    continue
-
-                cust = mc.get("customer") or {}
-                email_obj = cust.get("defaultEmailAddress") or {}
-
-                record = {
-                    "contact_id": mc.get("id"),
-                    "company_id": c.get("id"),
-                    "customer_id": cust.get("id"),
-                    "first_name": cust.get("firstName"),
-                    "last_name": cust.get("lastName"),
-                    "email": email_obj.get("emailAddress"),
-                    "customer_created_at": cust.get("createdAt"),
-                    "amount_spent_amount": (cust.get("amountSpent") or {}).get("amount"),
-                    "amount_spent_currency": (cust.get("amountSpent") or {}).get("currencyCode"),
-                }
-
-                yield clean_record_gids(record)
-
-        # ✅ Run both resources
-        pipeline.run(companies_resource())
-        pipeline.run(main_contacts_resource())
-
-    except Exception as e:
-        logging.exception(f"❌ Failed to load B2B companies: {e}")
+
+        ordersCount { count }
+        catalogsCount { count }
+        totalSpent { amount currencyCode }
+      }
+    }
+    pageInfo { hasNextPage endCursor }
+  }
+}
+"""
+
+# About 7 points per location (the node, company, both addresses and three counts/totals)
+COMPANY_LOCATIONS_PAGE_SIZE = 100
+
+# Scalar fields of a company location, unpacked in this order in locations_resource. GraphQL
+# returns every selected field (null when unset), so they can be fetched in one C-level call.
+LOCATION_CORE_FIELDS = operator.itemgetter(
+    "id", "name", "externalId", "note", "phone", "createdAt", "updatedAt", "currency"
+)
+
 
 def load_b2b_company_locations(pipeline: dlt.Pipeline) -> None:
     """
@@ -663,147 +784,71 @@ def load_b2b_company_locations(pipeline: dlt.Pipeline) -> None:
     Produces a single DLT table: b2b_company_locations
     """
 
-    try:
-        shop_domain = get_base_shop_domain()
-        access_token = dlt.config.get("sources.shopify_dlt.private_app_password")
+    ctx = shopify_context("2025-10")
+    if not ctx:
+        logging.warning("⚠️ Missing Shopify credentials; skipping b2b_company_locations.")
+        return
+
+    gql_url, headers = ctx.gql_url, ctx.headers
+
+    @dlt.resource(write_disposition="replace", name="b2b_company_locations")
+    def locations_resource():
+        total = 0
+        for loc in paginate_gql(
+            gql_url,
+            headers,
+            COMPANY_LOCATIONS_QUERY,
+            ("companyLocations",),
+            page_size=COMPANY_LOCATIONS_PAGE_SIZE,
+            timeout=30,
+        ):
+            total += 1
+            billing = loc.get("billingAddress") or EMPTY
+            shipping = loc.get("shippingAddress") or EMPTY
+            total_spent = loc.get("totalSpent") or EMPTY
+            loc_id, name, external_id, note, phone, created_at, updated_at, currency = (
+                LOCATION_CORE_FIELDS(loc)
+            )
+
+            record = {
+                # ---- Core fields ----
+                "id": loc_id,
+                "company_id": (loc.get("company") or EMPTY).get("id"),
+                "name": name,
+                "external_id": external_id,
+                "note": note,
+                "phone": phone,
+                "created_at": created_at,
+                "updated_at": updated_at,
+                "currency": currency,
+
+                # ---- Counts ----
+                "orders_count": (loc.get("ordersCount") or EMPTY).get("count"),
+                "catalogs_count": (loc.get("catalogsCount") or EMPTY).get("count"),
+
+                # ---- Money ----
+                "total_spent_amount": total_spent.get("amount"),
+                "total_spent_currency": total_spent.get("currencyCode"),
+
+                # ---- Billing address ----
+                "billing_address1": billing.get("address1"),
+                "billing_address2": billing.get("address2"),
+                "billing_city": billing.get("city"),
+                "billing_province": billing.get("province"),
+                "billing_country": billing.get("country"),
+                "billing_zip": billing.get("zip"),
+
+                # ---- Shipping address ----
+                "shipping_address1": shipping.get("address1"),
+                "shipping_address2": shipping.get("address2"),
+                "shipping_city": shipping.get("city"),
+                "shipping_province": shipping.get("province"),
+                "shipping_country": shipping.get("country"),
+                "shipping_zip": shipping.get("zip"),
+            }
 
-        if not shop_domain or not access_token:
-            logging.warning("⚠️ Missing Shopify credentials; skipping b2b_company_locations.")
-            return
+            yield clean_record_gids(record)
 
-        gql_url = f"https://{shop_domain}/admin/api/2025-10/graphql.json"
-        headers = {
-            "X-Shopify-Access-Token": access_token,
-            "Content-Type": "application/json",
-        }
+        logging.info("✅ Loaded %d B2B company locations", total)
 
-        # ✅ Query: only shallow fields + addresses
-        query = """
-        query GetCompanyLocations($first: Int!, $after: String) {
-          companyLocations(first: $first, after: $after) {
-            edges {
-              node {
-                id
-                name
-                externalId
-                note
-                phone
-                createdAt
-                updatedAt
-                currency
-
-                company { id }
-
-                billingAddress {
-                  address1
-                  address2
-                  city
-                  province
-                  country
-                  zip
-                }
-
-                shippingAddress {
-                  address1
-                  address2
-                  city
-                  province
-                  country
-                  zip
-                }
-
-                ordersCount { count }
-                catalogsCount { count }
-                totalSpent { amount currencyCode }
-              }
-            }
-            pageInfo { hasNextPage endCursor }
-          }
-        }
-        """
-
-        def fetch_all_locations():
-            all_rows = []
-            after = None
-
-            while True:
-                r = requests.post(
-                    gql_url,
-                    headers=headers,
-                    json={"query": query, "variables": {"first": 100, "after": after}},
-                    timeout=30,
-                )
-                r.raise_for_status()
-                pl = r.json()
-
-                if "errors" in pl:
-                    logging.error(f"❌ Shopify B2B API error: {pl['errors']}")
-                    return []
-
-                block = pl["data"]["companyLocations"]
-                edges = block.get("edges", [])
-                if not edges:
-                    break
-
-                for e in edges:
-                    all_rows.append(e["node"])
-
-                if not block["pageInfo"]["hasNextPage"]:
-                    break
-
-                after = block["pageInfo"]["endCursor"]
-
-            return all_rows
-
-        locations = fetch_all_locations()
-        logging.info(f"✅ Loaded {len(locations)} B2B company locations")
-        
-        @dlt.resource(write_disposition="replace", name="b2b_company_locations")
-        def locations_resource():
-            for loc in locations:
-                billing = loc.get("billingAddress") or {}
-                shipping = loc.get("shippingAddress") or {}
-
-                record = {
-                    # ---- Core fields ----
-                    "id": loc.get("id"),
-                    "company_id": (loc.get("company") or {}).get("id"),
-                    "name": loc.get("name"),
-                    "external_id": loc.get("externalId"),
-                    "note": loc.get("note"),
-                    "phone": loc.get("phone"),
-                    "created_at": loc.get("createdAt"),
-                    "updated_at": loc.get("updatedAt"),
-                    "currency": loc.get("currency"),
-
-                    # ---- Counts ----
-                    "orders_count": (loc.get("ordersCount") or {}).get("count"),
-                    "catalogs_count": (loc.get("catalogsCount") or {}).get("count"),
-
-                    # ---- Money ----
-                    "total_spent_amount": (loc.get("totalSpent") or {}).get("amount"),
-                    "total_spent_currency": (loc.get("totalSpent") or {}).get("currencyCode"),
-
-                    # ---- Billing address ----
-                    "billing_address1": billing.get("address1"),
-                    "billing_address2": billing.get("address2"),
-                    "billing_city": billing.get("city"),
-                    "billing_province": billing.get("province"),
-                    "billing_country": billing.get("country"),
-                    "billing_zip": billing.get("zip"),
-
-                    # ---- Shipping address ----
-                    "shipping_address1": shipping.get("address1"),
-                    "shipping_address2": shipping.get("address2"),
-                    "shipping_city": shipping.get("city"),
-                    "shipping_province": shipping.get("province"),
-                    "shipping_country": shipping.get("country"),
-                    "shipping_zip": shipping.get("zip"),
-                }
-
-                yield clean_record_gids(record)
-
-        pipeline.run(locations_resource())
-
-    except Exception as e:
-        logging.exception(f"❌ Failed to load B2B company locations: {e}")
+    pipeline.run(locations_resource())